@@ -3,22 +3,23 @@ import json
 import logging
 import os
 from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import Annotated
 from typing import Any
+from typing import Callable
 from typing import Optional
 from uuid import UUID
 
 import asyncpg
 import blibs
 from asgi_logger.middleware import AccessLoggerMiddleware
+from botbuilder.schema import Activity
 from botbuilder.schema import ErrorResponseException
 from fastapi import Body
 from fastapi import FastAPI
 from fastapi import HTTPException
-from fastapi import Response
 from fastapi import status
 from fastapi.middleware import Middleware
-from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 from pydantic import Field
@@ -28,14 +29,12 @@ from typing_extensions import Self
 from card_helper import cards
 from card_helper import Container_ContainerStyle
 from card_helper import TextBlock_Color as TextBlock_Color
-from config import DefaultConfig
+from config import config
 from db import database
 from teams_interface import TeamsInterface
 
 # from fastapi.middleware.cors import CORSMiddleware
 
-config = DefaultConfig()
-
 # Configure logging
 blibs.init_root_logger()
 logger = logging.getLogger(__name__)
@@ -47,8 +46,9 @@ logging.getLogger("msal").setLevel(logging.ERROR)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("starting app version %s", app.version)
-    await database.connect()
+    await database.connect(probe=config.DATABASE_STARTUP_PROBE)
     yield
+    await ti.disconnect()
     await database.disconnect()
 
 
@@ -75,6 +75,64 @@ app: FastAPI = FastAPI(
 
 ti = TeamsInterface(config)
 
+# Hot queries are kept as module constants so every call hits asyncpg's per-connection
+# prepared statement cache with the exact same query text
+_SQL_RESOLVE_IDS = """
+    SELECT  conversation_teams_id,
+            cr.conversation_reference_id AS conversation_reference_id,
+            ct.conversation_token_id AS conversation_token_id
+    FROM conversation_token ct
+    JOIN conversation_reference cr USING (conversation_reference_id)
+    WHERE conversation_token = $1
+"""
+
+_SQL_INSERT_MESSAGE = """
+    INSERT INTO message (conversation_token_id, conversation_reference_id, activity_id)
+    VALUES ($1, $2, $3) RETURNING message_id
+"""
+
+_SQL_MESSAGE_EXISTS = "SELECT true FROM message WHERE message_id = $1"
+
+# Flags the message as deleted and returns what's needed to delete the activity in one round-trip,
+# _SQL_RESTORE_DELETED_MESSAGE reverts it if Teams fails
+_SQL_DELETE_MESSAGE = """
+    UPDATE message SET deleted_at = NOW()
+    FROM conversation_reference cr
+    WHERE message.message_id = $1
+      AND message.deleted_at IS NULL
+      AND cr.conversation_reference_id = message.conversation_reference_id
+    RETURNING message.message_id, cr.conversation_teams_id, message.activity_id, message.deleted_at
+"""
+
+# Restores only match the value this request wrote, never reverting a concurrent request's change
+_SQL_RESTORE_DELETED_MESSAGE = """
+    UPDATE message SET deleted_at = NULL
+    WHERE message_id = $1 AND deleted_at = $2
+"""
+
+# Same for updates, previous locks the row before reading it so concurrent PATCHes see each other's
+# updated_at, a plain self-join would read it from the statement snapshot
+_SQL_UPDATE_MESSAGE = """
+    UPDATE message SET updated_at = NOW()
+    FROM (SELECT message_id, updated_at FROM message WHERE message_id = $1 FOR UPDATE) previous,
+         conversation_reference cr
+    WHERE message.message_id = previous.message_id
+      AND message.deleted_at IS NULL
+      AND cr.conversation_reference_id = message.conversation_reference_id
+    RETURNING  message.message_id,
+               cr.conversation_teams_id,
+               message.activity_id,
+               message.updated_at,
+               previous.updated_at AS previous_updated_at
+"""
+
+_SQL_RESTORE_UPDATED_MESSAGE = """
+    UPDATE message SET updated_at = $2
+    WHERE message_id = $1 AND updated_at = $3
+"""
+
+_SQL_HEALTHCHECK = "SELECT true FROM conversation_reference"
+
 
 @app.get("/", response_class=RedirectResponse, status_code=302)
 async def root():
@@ -86,15 +144,11 @@ class MessageId(BaseModel):
 
 
 class MessagePatchResponse(MessageId):
-    updated_at: str = Field(
-        description="RFC 3339 [ISO 8601 with a space instead of a T]), ex: 2024-11-14 07:20:31.320543+00:00"
-    )
+    updated_at: datetime = Field(description="RFC 3339, ex: 2024-11-14T07:20:31.320543Z")
 
 
 class MessageDeleteResponse(MessageId):
-    deleted_at: str = Field(
-        description="RFC 3339 [ISO 8601 with a space instead of a T]), ex: 2024-11-14 07:20:31.320543+00:00"
-    )
+    deleted_at: datetime = Field(description="RFC 3339, ex: 2024-11-14T07:20:31.320543Z")
 
 
 class TextMessage(BaseModel):
@@ -118,69 +172,75 @@ class TextMessage(BaseModel):
     summary: str | None = Field(None, description="summary")
 
 
-async def send_payload(conversation_token: UUID, payload, summary: str = "") -> Response:
-    connection: asyncpg.pool.PoolConnectionProxy
-    async with await database.acquire() as connection:
-        handful_of_ids = await connection.fetchrow(
-            """
-            SELECT  conversation_teams_id,
-                    cr.conversation_reference_id AS conversation_reference_id,
-                    ct.conversation_token_id AS conversation_token_id
-            FROM conversation_token ct
-            JOIN conversation_reference cr USING (conversation_reference_id)
-            WHERE conversation_token = $1""",
-            conversation_token,
+_CARD_BUILDERS: dict[type, Callable[[Any, str], Activity]] = {
+    str: lambda text, summary: cards.simple_message(text),
+    TextMessage: lambda message, summary: cards.simple_message(
+        message.text,
+        style=message.style,
+        bleed=message.bleed,
+        title=message.title,
+        title_color=message.title_color,
+        title_style=message.title_style,
+        title_bleed=message.title_bleed,
+    ),
+    dict: lambda card, summary: cards.card(card, summary),
+}
+
+
+def _build_card(payload: Any, summary: str) -> Activity:
+    """builds the activity for a text, a simple message or a card payload"""
+    try:
+        builder = _CARD_BUILDERS[type(payload)]
+    except KeyError:
+        raise HTTPException(
+            status_code=400,
+            detail="invalid payload, neither a text, a message nor a card",
         )
+    return builder(payload, summary)
+
+
+def _translate_teams_error(exc: ErrorResponseException) -> HTTPException:
+    """exposes the Teams error response to the caller as a 400"""
+    return HTTPException(
+        status_code=400,
+        detail={
+            "response": json.loads(exc.response.content.decode("utf-8")),
+            "args": exc.args,
+            "message": exc.message,
+        },
+    )
+
+
+async def send_payload(conversation_token: UUID, payload, summary: str = "") -> MessageId:
+    built_card = _build_card(payload, summary)
+
+    connection: asyncpg.pool.PoolConnectionProxy
+    async with database.acquire() as connection:
+        handful_of_ids = await connection.fetchrow(_SQL_RESOLVE_IDS, conversation_token)
         if handful_of_ids is None:
             raise HTTPException(
                 status_code=400,
                 detail="invalid conversation_token",
             )
 
-        built_card = None
-        if isinstance(payload, str):
-            built_card = cards.simple_message(payload)
-        elif isinstance(payload, TextMessage):
-            built_card = cards.simple_message(
-                payload.text,
-                style=payload.style,
-                bleed=payload.bleed,
-                title=payload.title,
-                title_color=payload.title_color,
-                title_style=payload.title_style,
-                title_bleed=payload.title_bleed,
-            )
-        else:
-            built_card = cards.card(payload, summary)
-
-        try:
-            activity_id = await ti.send_to_conversation(
-                handful_of_ids["conversation_teams_id"],
-                built_card,
-            )
-        except ErrorResponseException as exc:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "response": json.loads(exc.response.content.decode("utf-8")),
-                    "args": exc.args,
-                    "message": exc.message,
-                },
-            )
+    try:
+        activity_id = await ti.send_to_conversation(
+            handful_of_ids["conversation_teams_id"],
+            built_card,
+        )
+    except ErrorResponseException as exc:
+        raise _translate_teams_error(exc)
 
+    # connection is not held across the (slow) Teams call to keep the pool available
+    async with database.acquire() as connection:
         result = await connection.fetchrow(
-            """
-            INSERT INTO message (conversation_token_id, conversation_reference_id, activity_id)
-            VALUES ($1, $2, $3) RETURNING message_id
-            """,
+            _SQL_INSERT_MESSAGE,
             handful_of_ids["conversation_token_id"],
             handful_of_ids["conversation_reference_id"],
             activity_id,
         )
 
-    return JSONResponse(
-        status_code=status.HTTP_201_CREATED, content={"message_id": str(result["message_id"])}
-    )
+    return MessageId.model_construct(message_id=result["message_id"])  # type: ignore
 
 
 class ConversationTokenAndMessageOfAnyType(BaseModel):
@@ -197,12 +257,12 @@ class ConversationTokenAndMessageOfAnyType(BaseModel):
 
     @model_validator(mode="after")
     def check_that_only_one_message_type_is_filled(self) -> Self:
-        if sum([0 if x is None else 1 for x in [self.message, self.text, self.card]]) != 1:
+        if (self.message is not None) + (self.text is not None) + (self.card is not None) != 1:
             raise ValueError("One and only one of message, text, or card must be filled")
         return self
 
 
-@app.post("/api/v1/message", response_model=MessageId)
+@app.post("/api/v1/message", response_model=MessageId, status_code=status.HTTP_201_CREATED)
 async def post_message_of_any_type(
     post: Annotated[ConversationTokenAndMessageOfAnyType, Body()],
 ):
@@ -219,7 +279,7 @@ async def post_message_of_any_type(
     )
 
 
-@app.post("/api/v1/message/text", response_model=MessageId)
+@app.post("/api/v1/message/text", response_model=MessageId, status_code=status.HTTP_201_CREATED)
 async def send_text_message(
     conversation_token: Annotated[UUID, Body()],
     text: Annotated[str, Body()],
@@ -228,7 +288,7 @@ async def send_text_message(
     return await send_payload(conversation_token, text)
 
 
-@app.post("/api/v1/message/simple", response_model=MessageId)
+@app.post("/api/v1/message/simple", response_model=MessageId, status_code=status.HTTP_201_CREATED)
 async def send_simple_message(
     conversation_token: Annotated[UUID, Body()],
     message: Annotated[TextMessage, Body()],
@@ -240,7 +300,7 @@ async def send_simple_message(
     return await send_payload(conversation_token, message)
 
 
-@app.post("/api/v1/message/card", response_model=MessageId)
+@app.post("/api/v1/message/card", response_model=MessageId, status_code=status.HTTP_201_CREATED)
 async def send_adaptivecard(
     conversation_token: Annotated[UUID, Body()],
     card: Annotated[dict[str, Any], Body()],
@@ -258,44 +318,37 @@ async def delete_message(
     message_id: Annotated[MessageId, Body()],
 ):
     connection: asyncpg.pool.PoolConnectionProxy
-    async with await database.acquire() as connection:
-        message = await connection.fetchrow(
-            """
-            SELECT message_id, conversation_teams_id, activity_id, deleted_at
-            FROM message
-            JOIN conversation_reference USING (conversation_reference_id)
-            WHERE message_id = $1
-            """,
-            message_id.message_id,
-        )
+    async with database.acquire() as connection:
+        message = await connection.fetchrow(_SQL_DELETE_MESSAGE, message_id.message_id)
         if message is None:
-            raise HTTPException(
-                status_code=400,
-                detail="invalid message_id",
-            )
+            if await connection.fetchval(_SQL_MESSAGE_EXISTS, message_id.message_id) is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="invalid message_id",
+                )
 
-        if message["deleted_at"] is not None:
             raise HTTPException(
                 status_code=410,
                 detail="message_id already deleted",
             )
 
+    try:
         await ti.delete_activity(
             message["conversation_teams_id"],
             message["activity_id"],
         )
+    except Exception:
+        async with database.acquire() as connection:
+            await connection.execute(
+                _SQL_RESTORE_DELETED_MESSAGE,
+                message_id.message_id,
+                message["deleted_at"],
+            )
+        raise
 
-        result = await connection.fetchrow(
-            "UPDATE message SET deleted_at = NOW() WHERE message_id = $1 RETURNING message_id, deleted_at",
-            message_id.message_id,
-        )
-
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content={
-            "message_id": str(result["message_id"]),
-            "deleted_at": str(result["deleted_at"]),
-        },
+    return MessageDeleteResponse.model_construct(
+        message_id=message["message_id"],
+        deleted_at=message["deleted_at"],
     )
 
 
@@ -313,12 +366,12 @@ class MessageIdAndMessageOfAnyType(BaseModel):
 
     @model_validator(mode="after")
     def check_that_only_one_message_type_is_filled(self) -> Self:
-        if sum([0 if x is None else 1 for x in [self.message, self.text, self.card]]) != 1:
+        if (self.message is not None) + (self.text is not None) + (self.card is not None) != 1:
             raise ValueError("one and only one of message, text, or card must be filled")
         return self
 
 
-@app.patch("/api/v1/message", response_model=MessagePatchResponse)
+@app.patch("/api/v1/message", response_model=MessagePatchResponse, status_code=status.HTTP_201_CREATED)
 async def patch_activity(
     msg_to_patch: Annotated[MessageIdAndMessageOfAnyType, Body()],
 ):
@@ -329,83 +382,48 @@ async def patch_activity(
     `summary` will not be used and is kept only for payload coherence
     """
 
+    built_card = _build_card(
+        msg_to_patch.message or msg_to_patch.text or msg_to_patch.card,
+        msg_to_patch.summary,
+    )
+
     connection: asyncpg.pool.PoolConnectionProxy
-    async with await database.acquire() as connection:
-        activity_details = await connection.fetchrow(
-            """
-            SELECT  conversation_teams_id,
-                    activity_id,
-                    deleted_at
-            FROM message
-            JOIN conversation_reference cr USING (conversation_reference_id)
-            WHERE message_id = $1
-            """,
-            msg_to_patch.message_id,
-        )
+    async with database.acquire() as connection:
+        activity_details = await connection.fetchrow(_SQL_UPDATE_MESSAGE, msg_to_patch.message_id)
         if activity_details is None:
-            raise HTTPException(
-                status_code=400,
-                detail="invalid message_id",
-            )
+            if await connection.fetchval(_SQL_MESSAGE_EXISTS, msg_to_patch.message_id) is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="invalid message_id",
+                )
 
-        if activity_details["deleted_at"] is not None:
             raise HTTPException(
                 status_code=400,
                 detail="message deleted, can't be updated",
             )
 
-        payload = msg_to_patch.message or msg_to_patch.text or msg_to_patch.card
-        built_card = None
-        if isinstance(payload, str):
-            built_card = cards.simple_message(payload)
-        elif isinstance(payload, TextMessage):
-            built_card = cards.simple_message(
-                payload.text,
-                style=payload.style,
-                bleed=payload.bleed,
-                title=payload.title,
-                title_color=payload.title_color,
-                title_style=payload.title_style,
-                title_bleed=payload.title_bleed,
-            )
-        elif isinstance(payload, dict):
-            built_card = cards.card(payload, msg_to_patch.summary)
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="invalid payload, neither a text, a message nor a card",
-            )
-
-        try:
-            await ti.update_activity(
-                conversation_teams_id=activity_details["conversation_teams_id"],
-                activity_id=activity_details["activity_id"],
-                activity=built_card,
-            )
-        except ErrorResponseException as exc:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "response": json.loads(exc.response.content.decode("utf-8")),
-                    "args": exc.args,
-                    "message": exc.message,
-                },
+    try:
+        await ti.update_activity(
+            conversation_teams_id=activity_details["conversation_teams_id"],
+            activity_id=activity_details["activity_id"],
+            activity=built_card,
+        )
+    except Exception as exc:
+        async with database.acquire() as connection:
+            await connection.execute(
+                _SQL_RESTORE_UPDATED_MESSAGE,
+                msg_to_patch.message_id,
+                activity_details["previous_updated_at"],
+                activity_details["updated_at"],
             )
 
-        result = await connection.fetchrow(
-            """
-            UPDATE message SET updated_at = NOW()
-            WHERE message_id = $1 RETURNING message_id, updated_at
-            """,
-            msg_to_patch.message_id,
-        )
+        if isinstance(exc, ErrorResponseException):
+            raise _translate_teams_error(exc)
+        raise
 
-    return JSONResponse(
-        status_code=status.HTTP_201_CREATED,
-        content={
-            "message_id": str(result["message_id"]),
-            "updated_at": str(result["updated_at"]),
-        },
+    return MessagePatchResponse.model_construct(
+        message_id=activity_details["message_id"],
+        updated_at=activity_details["updated_at"],
     )
 
 
@@ -413,8 +431,8 @@ async def patch_activity(
 async def healthcheck():
     try:
         connection: asyncpg.pool.PoolConnectionProxy
-        async with await database.acquire() as connection:
-            result = await connection.fetchval("SELECT true FROM conversation_reference")
+        async with database.acquire() as connection:
+            result = await connection.fetchval(_SQL_HEALTHCHECK)
             return {"ok": result}
     except Exception as e:
         logger.exception(f"health check failed with {type(e)}: {e}")
@@ -437,6 +455,8 @@ if __name__ == "__main__":
             app,
             host="0.0.0.0",
             port=int(config.PORT),
+            loop="uvloop",
+            http="httptools",
         )
 
     logging.getLogger("uvicorn.access").handlers = []
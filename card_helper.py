@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
-import json
+import copy
+import functools
 from abc import ABC
 from abc import abstractmethod
 from enum import Enum
 from typing import Any
 from typing import Optional
 
+import orjson
 from botbuilder.core import CardFactory
 from botbuilder.schema import Activity
 from botbuilder.schema import ActivityTypes
+from botbuilder.schema import Attachment
 
 
 class TextBlock_Color(Enum):
@@ -73,16 +76,25 @@ _BASIC_CARD = {
 
 _TEXT_BLOC = {"type": "TextBlock", "text": "message", "wrap": True}
 
+# prototype for plain text messages, shallow copies skip the msrest model __init__ but share its nested
+# additional_properties dict, which copies must replace
+_TEXT_ACTIVITY = Activity(type=ActivityTypes.message)
+
 
 class ACBuildable(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def build(self) -> dict[str, Any]:
         pass
 
 
 class BaseCardBuilder:
+    __slots__ = ("_body", "_card")
+
     def __init__(self) -> None:
         self._body: list[ACBuildable] = []
+        self._card: dict[str, Any] = _BASIC_CARD.copy()
 
     def add(self, item: ACBuildable) -> "BaseCardBuilder":
         self._body.append(item)
@@ -91,18 +103,20 @@ class BaseCardBuilder:
     def build(
         self,
     ) -> dict[str, Any]:
-        return {
-            "type": "AdaptiveCard",
-            "$schema": "https://adaptivecards.io/schemas/adaptive-card.json",
-            "version": "1.5",
-            "body": [element.build() for element in self._body],
-        }
+        # builders are single use, the returned card is the builder's own dict
+        self._card["body"] = [element.build() for element in self._body]
+        return self._card
 
     def __str__(self) -> str:
-        return json.dumps(self.build())
+        return orjson.dumps(self.build()).decode()  # type: ignore
 
 
 class TextBlock(ACBuildable):
+    __slots__ = ("_item",)
+
+    # adaptive card keys of the optional attributes, in __init__ parameters order
+    _FIELDS = ("style", "color", "weight", "size", "spacing", "fontType")
+
     def __init__(
         self,
         text: str,
@@ -113,28 +127,26 @@ class TextBlock(ACBuildable):
         spacing: Optional[TextBlock_Spacing] = None,
         font_type: Optional[TextBlock_FontType] = None,
     ) -> None:
-        self._item = {"type": "TextBlock", "text": text, "wrap": True}
-        if style is not None:
-            self._item["style"] = style.value
-        if color is not None:
-            self._item["color"] = color.value
-        if weight is not None:
-            self._item["weight"] = weight.value
-        if size is not None:
-            self._item["size"] = size.value
-        if spacing is not None:
-            self._item["spacing"] = spacing.value
-        if font_type is not None:
-            self._item["fontType"] = font_type.value
+        self._item: dict[str, Any] = {
+            **_TEXT_BLOC,
+            "text": text,
+            **{
+                key: value.value
+                for key, value in zip(self._FIELDS, (style, color, weight, size, spacing, font_type))
+                if value is not None
+            },
+        }
 
     def build(self) -> dict[str, Any]:
         return self._item
 
     def __str__(self) -> str:
-        return json.dumps(self.build())
+        return orjson.dumps(self.build()).decode()  # type: ignore
 
 
 class Container(ACBuildable):
+    __slots__ = ("_item", "_items")
+
     def __init__(
         self,
         style: Optional[Container_ContainerStyle] = None,
@@ -151,12 +163,52 @@ class Container(ACBuildable):
             self._item["bleed"] = bleed
 
     def build(self) -> dict[str, Any]:
-        result = self._item.copy()
-        result["items"] = [element.build() for element in self._items]
-        return result
+        self._item["items"] = [element.build() for element in self._items]
+        return self._item
 
     def __str__(self) -> str:
-        return json.dumps(self.build())
+        return orjson.dumps(self.build()).decode()  # type: ignore
+
+
+@functools.lru_cache(maxsize=1024)
+def _simple_message_attachment(
+    text: str,
+    style: Container_ContainerStyle | None,
+    bleed: bool | None,
+    title: str | None,
+    title_color: TextBlock_Color | None,
+    title_style: Container_ContainerStyle | None,
+    title_bleed: bool | None,
+) -> Attachment:
+    """builds the simple message card attachment, cached as notifications mostly reuse a few templates
+
+    the returned attachment is shared between calls and must not be mutated
+    """
+    msg = BaseCardBuilder()
+    if title:
+        msg.add(
+            Container(
+                bleed=title_bleed,
+                style=title_style or Container_ContainerStyle.DEFAULT,
+                items=[
+                    TextBlock(
+                        title,
+                        style=TextBlock_Style.HEADING,
+                        color=title_color,
+                        weight=TextBlock_FontWeight.BOLDER,
+                    )
+                ],
+            )
+        )
+
+    msg.add(
+        Container(
+            style=style or Container_ContainerStyle.DEFAULT,
+            bleed=bleed,
+            items=[TextBlock(text)],
+        )
+    )
+    return CardFactory.adaptive_card(card=msg.build())
 
 
 class CardHelper:
@@ -173,46 +225,20 @@ class CardHelper:
         title_bleed: bool | None = None,
         summary: str | None = None,
     ) -> Activity:
-        msg = BaseCardBuilder()
-        if title_style is None:
-            title_style = Container_ContainerStyle.DEFAULT
         if title or style or bleed:
-            if title:
-                msg.add(
-                    Container(
-                        bleed=title_bleed,
-                        style=title_style,
-                        items=[
-                            TextBlock(
-                                title,
-                                style=TextBlock_Style.HEADING,
-                                color=title_color,
-                                weight=TextBlock_FontWeight.BOLDER,
-                            )
-                        ],
-                    )
-                )
-
-            if style is None:
-                style = Container_ContainerStyle.DEFAULT
-            text_element = Container(
-                style=style,
-                bleed=bleed,
-                items=[TextBlock(text)],
+            attachment = _simple_message_attachment(
+                text, style, bleed, title, title_color, title_style, title_bleed
             )
-            msg.add(text_element)
-            card = msg.build()
-            print(card)
             return Activity(
                 type=ActivityTypes.message,
-                attachments=[CardFactory.adaptive_card(card=card)],
+                attachments=[attachment],
                 summary=summary or title or text,
             )
         else:
-            return Activity(
-                type=ActivityTypes.message,
-                text=text,
-            )
+            activity = copy.copy(_TEXT_ACTIVITY)
+            activity.additional_properties = {}
+            activity.text = text
+            return activity
 
     def card(
         self,
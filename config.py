@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
-import base64
-import hashlib
+import binascii
+import functools
 import os
 
 import dotenv
 from botframework.connector.auth import AppCredentials
 from botframework.connector.auth import CertificateAppCredentials
 from botframework.connector.auth import MicrosoftAppCredentials
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
 
 dotenv.load_dotenv()
 """ Bot Configuration """
@@ -25,27 +27,45 @@ class DefaultConfig:
     APP_TYPE = os.environ.get("MICROSOFT_APP_TYPE", "MultiTenant")
     APP_TENANTID = os.environ.get("MICROSOFT_APP_TENANT_ID", "")
     DATABASE_URL = os.environ.get("DATABASE_URL", "")
+    DATABASE_POOL_MIN_SIZE = int(os.environ.get("DATABASE_POOL_MIN_SIZE", "10"))
+    DATABASE_POOL_MAX_SIZE = int(os.environ.get("DATABASE_POOL_MAX_SIZE", "50"))
+    DATABASE_POOL_MAX_INACTIVE_CONNECTION_LIFETIME = float(
+        os.environ.get("DATABASE_POOL_MAX_INACTIVE_CONNECTION_LIFETIME", "300")
+    )
+    DATABASE_COMMAND_TIMEOUT = float(os.environ.get("DATABASE_COMMAND_TIMEOUT", "60"))
+    DATABASE_STATEMENT_CACHE_SIZE = int(os.environ.get("DATABASE_STATEMENT_CACHE_SIZE", "1024"))
+    DATABASE_STARTUP_PROBE = os.environ.get("DATABASE_STARTUP_PROBE", "true").lower() in ("1", "true", "yes")
 
     def get_credentials(self) -> AppCredentials:
-        if self.APP_PASSWORD:
-            return MicrosoftAppCredentials(self.APP_ID, self.APP_PASSWORD)
-
-        if not self.APP_CERTIFICATE or not self.APP_PRIVATEKEY:
-            raise ValueError(
-                "missing either MICROSOFT_APP_PASSWORD or "
-                "MICROSOFT_APP_CERTIFICATE and MICROSOFT_APP_PRIVATEKEY"
-            )
-
-        certificate = base64.b64decode(self.APP_CERTIFICATE).decode("ascii")
-        cert_thumbprint = hashlib.sha1(
-            base64.b64decode(
-                certificate.split("-----BEGIN CERTIFICATE-----\n")[1].split("-----END CERTIFICATE-----\n")[0]
-            )
-        ).hexdigest()
-        privkey = base64.b64decode(self.APP_PRIVATEKEY).decode("ascii")
-
-        return CertificateAppCredentials(
-            app_id=self.APP_ID,
-            certificate_thumbprint=cert_thumbprint,
-            certificate_private_key=privkey,
+        return _build_credentials(self.APP_ID, self.APP_PASSWORD, self.APP_CERTIFICATE, self.APP_PRIVATEKEY)
+
+
+@functools.cache
+def _build_credentials(
+    app_id: str,
+    app_password: str,
+    app_certificate: str,
+    app_privatekey: str,
+) -> AppCredentials:
+    """builds the app credentials once per settings, decoding and hashing the certificate is not free"""
+    if app_password:
+        return MicrosoftAppCredentials(app_id, app_password)
+
+    if not app_certificate or not app_privatekey:
+        raise ValueError(
+            "missing either MICROSOFT_APP_PASSWORD or "
+            "MICROSOFT_APP_CERTIFICATE and MICROSOFT_APP_PRIVATEKEY"
         )
+
+    certificate = x509.load_pem_x509_certificate(binascii.a2b_base64(app_certificate))
+    cert_thumbprint = certificate.fingerprint(hashes.SHA1()).hex()
+    privkey = binascii.a2b_base64(app_privatekey).decode("ascii")
+
+    return CertificateAppCredentials(
+        app_id=app_id,
+        certificate_thumbprint=cert_thumbprint,
+        certificate_private_key=privkey,
+    )
+
+
+config = DefaultConfig()
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 import asyncio
 import logging
+from typing import cast
 
 import asyncpg.connect_utils
 
-import config
+from config import config
 
 log = logging.getLogger(__name__)
 
@@ -24,29 +25,57 @@ class NoResetConnection(asyncpg.connection.Connection):
 
 
 class DatabaseLifecycleHandler:
-    def __init__(self, dsn: str):
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        min_size: int = 10,
+        max_size: int = 50,
+        max_inactive_connection_lifetime: float = 300.0,
+        command_timeout: float | None = 60.0,
+        statement_cache_size: int = 1024,
+    ):
         self._pool: asyncpg.Pool | None = None
         self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_inactive_connection_lifetime = max_inactive_connection_lifetime
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
 
-    async def connect(self):
+    async def connect(self, probe: bool = True):
         log.debug("connecting to database")
+        # create_pool opens min_size connections before returning, the pool is warm once awaited
         self._pool = await asyncpg.create_pool(
             dsn=self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+            command_timeout=self.command_timeout,
             server_settings={"application_name": "notiteams-activity-api"},
             connection_class=NoResetConnection,
+            statement_cache_size=self.statement_cache_size,
         )
 
         # Simple check at startup, will validate database resolution and creds
-        async with await self.acquire() as connection:
-            await connection.fetchval("SELECT 1")
+        if probe:
+            async with self.acquire() as connection:
+                await connection.fetchval("SELECT 1")
 
     async def disconnect(self):
         if self._pool:
             await self._pool.close()
 
-    async def acquire(self) -> asyncpg.pool.PoolAcquireContext:
-        assert self._pool is not None
-        return self._pool.acquire()
+    def acquire(self) -> asyncpg.pool.PoolAcquireContext:
+        # only valid once connect() has been awaited
+        return cast(asyncpg.Pool, self._pool).acquire()
 
 
-database = DatabaseLifecycleHandler(config.DefaultConfig.DATABASE_URL)
+database = DatabaseLifecycleHandler(
+    config.DATABASE_URL,
+    min_size=config.DATABASE_POOL_MIN_SIZE,
+    max_size=config.DATABASE_POOL_MAX_SIZE,
+    max_inactive_connection_lifetime=config.DATABASE_POOL_MAX_INACTIVE_CONNECTION_LIFETIME,
+    command_timeout=config.DATABASE_COMMAND_TIMEOUT,
+    statement_cache_size=config.DATABASE_STATEMENT_CACHE_SIZE,
+)
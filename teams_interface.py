@@ -1,29 +1,40 @@
 #!/usr/bin/env python3
+import asyncio
+import functools
+
 from botbuilder.schema import Activity
 from botbuilder.schema import ActivityTypes
 from botbuilder.schema import ChannelAccount
 from botframework.connector.aio import ConnectorClient
+from botframework.connector.auth import AppCredentials
 from opentelemetry import trace
 
 from config import DefaultConfig
 
-config = DefaultConfig()
 tracer = trace.get_tracer(__name__)
 
 SERVICE_URL = "https://smba.trafficmanager.net/amer/"
 CHANNEL_ID = "msteams"
 
 
+@functools.cache
+def _get_connector(credentials: AppCredentials, base_url: str) -> ConnectorClient:
+    """one connector, and so one HTTP session and token cache, per credentials and service url"""
+    return ConnectorClient(credentials, base_url=base_url)
+
+
 class TeamsInterface:
     def __init__(self, config: DefaultConfig) -> None:
-        self._connector = ConnectorClient(
-            config.get_credentials(),
-            base_url=SERVICE_URL,
-        )
+        self._connector = _get_connector(config.get_credentials(), SERVICE_URL)
         self._conv = self._connector.conversations
         self._chanacc = ChannelAccount(id=config.APP_ID)
         self.me = self._chanacc
 
+    async def disconnect(self) -> None:
+        # closes the requests session of the connector shared by every TeamsInterface (see _get_connector),
+        # only call it at shutdown
+        await self._connector.__aexit__(None, None, None)
+
     def str_to_activity(self, activity: Activity | str) -> Activity:
         if isinstance(activity, Activity):
             return activity
@@ -46,6 +57,19 @@ class TeamsInterface:
         )
         return result.id  # type: ignore
 
+    @tracer.start_as_current_span("send_batch")
+    async def send_batch(
+        self,
+        conversation_teams_ids: list[str],
+        activity: Activity,
+    ) -> list[str | BaseException]:
+        """returns, in conversation_teams_ids order, each activity id or the exception raised for it
+        sends run in the default executor, so at most min(32, cpu_count + 4) at once"""
+        return await asyncio.gather(  # type: ignore
+            *(self.send_to_conversation(conv_id, activity) for conv_id in conversation_teams_ids),
+            return_exceptions=True,
+        )
+
     @tracer.start_as_current_span("update_activity")
     async def update_activity(
         self,